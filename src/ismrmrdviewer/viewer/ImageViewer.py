@@ -11,11 +11,43 @@ from PySide6.QtGui import QIcon
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib import animation
-from functools import cache
+from functools import lru_cache
 import ismrmrd
 
 from importlib.resources import files
 
+# Record layout of single precision complex image data, which can be viewed as complex64 without copying
+COMPLEX64_RECORD = np.dtype([('real', '<f4'), ('imag', '<f4')])
+
+def display_orientation(transposed, fliph, flipv, nrot):
+    """
+    Collapses the view transforms of a stored frame into one (transpose, flip rows, flip columns).
+    Stored frames are shown rotated by 90 degrees and flipped left-right; then transposed, flipped
+    and rotated by nrot quarter turns as selected.
+    """
+    def transpose(t, fr, fc):
+        return (not t, fc, fr)
+    def rot90(t, fr, fc):
+        t, fr, fc = transpose(t, fr, fc)
+        return (t, not fr, fc)
+
+    o = (False, False, False)
+    o = rot90(*o)
+    o = (o[0], o[1], not o[2])
+    if transposed:
+        o = transpose(*o)
+    if fliph:
+        o = (o[0], o[1], not o[2])
+    if flipv:
+        o = (o[0], not o[1], o[2])
+    for _ in range(nrot % 4):
+        o = rot90(*o)
+    return o
+
+# (transpose, flip rows, flip columns) of every (transposed, fliph, flipv, nrot) view
+ORIENTATIONS = {(t, h, v, k): display_orientation(t, h, v, k)
+                for t in (False, True) for h in (False, True) for v in (False, True) for k in range(4)}
+
 DIMS = ('Instance', 'Repetition', 'Set', 'Phase', 'Slice', 'Contrast', 'Channel')
 
 class ImageViewer(QTW.QWidget):
@@ -32,17 +64,40 @@ class ImageViewer(QTW.QWidget):
         self.container = container
         logging.info("Image constructor.")
 
+        # Per viewer caches, so a closed viewer frees its data. 64 slabs are enough to animate
+        # one dimension without re-reading.
+        self.fetch_image = lru_cache(maxsize=64)(self.__fetch_image)
+        self.view_frame = lru_cache(maxsize=8)(self.__view_frame)
+        self.image_stats = lru_cache(maxsize=32)(self.__image_stats)
+
         # Main layout
         layout = QTW.QVBoxLayout(self)
 
-        self.nphase = int(np.max(self.container.images.headers['phase'])+1)
-        self.nset = int(np.max(self.container.images.headers['set'])+1)
-        self.nrep = int(np.max(self.container.images.headers['repetition'])+1)
-        self.nslice = int(np.max(self.container.images.headers['slice'])+1)
-        self.ncontrast = int(np.max(self.container.images.headers['contrast'])+1)
+        # Every header field access reads the whole HDF5 header table; read all the index columns
+        # in one pass, into contiguous arrays, and use those instead of the header records.
+        idx_fields_ = ('average', 'slice', 'contrast', 'phase', 'repetition', 'set')
+        headers_ = self.container.images.headers.fields(list(idx_fields_))[()]
+        self.header_idx_ = {field: np.ascontiguousarray(headers_[field], dtype=np.int32) for field in idx_fields_}
+        phase_ = self.header_idx_['phase']
+        set_ = self.header_idx_['set']
+        repetition_ = self.header_idx_['repetition']
+        slice_ = self.header_idx_['slice']
+        contrast_ = self.header_idx_['contrast']
+
+        self.nphase, self.nset, self.nrep, self.nslice, self.ncontrast = (
+            int(n) for n in np.max(np.stack((phase_, set_, repetition_, slice_, contrast_)), axis=1) + 1)
 
         self.nimg = max(int(len(self.container.images)/self.nphase/self.nset/self.nrep/self.nslice/self.ncontrast), 1) # TODO: Remove this, as it is broken and unnecessary if we handle everything right.
 
+        # Flatten (repetition, set, phase, slice, contrast) of every image into a single key,
+        # so image_rows is a table lookup instead of a scan over five header columns.
+        self.key_dims_ = (self.nrep, self.nset, self.nphase, self.nslice, self.ncontrast)
+        keys_ = np.ravel_multi_index((repetition_, set_, phase_, slice_, contrast_), self.key_dims_)
+        # Group the rows by key, keeping instance order within each key: the rows of key k
+        # are rows_by_key_[key_offsets_[k]:key_offsets_[k+1]].
+        self.rows_by_key_ = np.argsort(keys_, kind='stable')
+        self.key_offsets_ = np.concatenate(([0], np.cumsum(np.bincount(keys_, minlength=np.prod(self.key_dims_)))))
+
         # Dimension controls; Add a widget with a horizontal layout
         cw = QTW.QWidget()
         layout.addWidget(cw)
@@ -50,6 +105,7 @@ class ImageViewer(QTW.QWidget):
         controls.setContentsMargins(0,0,0,0)
 
         # Create a drop-down for the image instance
+        self.update_pending_ = False
         self.dim_buttons = {}
         self.selected = {}
         self.dim_button_grp = QTW.QButtonGroup()
@@ -61,7 +117,10 @@ class ImageViewer(QTW.QWidget):
             controls.addWidget(self.dim_buttons[dim])
             self.selected[dim] = QTW.QSpinBox()
             controls.addWidget(self.selected[dim])
-            self.selected[dim].valueChanged.connect(self.update_image)
+            self.selected[dim].valueChanged.connect(self.schedule_update)
+        # Direct references for the convenience getters, which run several times per update
+        (self.instance_sb_, self.repetition_sb_, self.set_sb_, self.phase_sb_,
+         self.slice_sb_, self.contrast_sb_, self.channel_sb_) = (self.selected[dim] for dim in DIMS)
 
         self.dim_buttons['Instance'].setChecked(True)
         self.selected['Instance'].setMaximum(self.nimg - 1)
@@ -128,6 +187,7 @@ class ImageViewer(QTW.QWidget):
         self.nrot_ = 0
         self.fliph_ = False
         self.flipv_ = False
+        self.transposed_ = False
 
         self.rot_cw_button.clicked.connect(self.rotate_cw)
         self.rot_ccw_button.clicked.connect(self.rotate_ccw)
@@ -168,46 +228,56 @@ class ImageViewer(QTW.QWidget):
                                   QTW.QSizePolicy.Expanding)
         layout.addWidget(self.canvas)
 
+        # Axes background for blitting; refreshed after every full draw, including resizes. The
+        # spines are animated, so left out of it, and drawn once over the image, as in a full draw.
+        self.background_ = None
+        for spine in self.ax.spines.values():
+            spine.set_animated(True)
+        self.canvas.mpl_connect('draw_event', self.cache_background)
+
         self.label_base = "A{:d}/S{:d}/C{:d}/P{:d}/R{:d}/S{:d}"
         self.label = QTW.QLabel("")
         self.label.setMaximumSize(140, 20)
 
         layout.addWidget(self.label)
 
-        try:
-            # TODO: This is ugly.
-            container.images.data.dtype['imag'] # Test if complex
-            data_ = np.flip(np.rot90(np.abs(container.images.data[:,:,:,:,:]['real'] + 1j*container.images.data[:,:,:,:,:]['imag']), axes=(3,4)), axis=4)
-        except KeyError as e:
-            data_ = np.flip(np.rot90(container.images.data, axes=(3,4)), axis=4)
-       
-        self.data_ = data_
+        # Image data is read lazily, per (repetition, set, phase, slice, contrast), by fetch_image.
         # TODO: This indexing does not work properly. Need a better way for handling "unspecified" frames in the header.
 
         if self.nimg == 1:
             self.animate.setEnabled(False)
 
+        # Sizes of all dimensions; static, as every fetched slab has the shape of the first one.
+        # Rows and columns as displayed; the stored frames are rotated by 90 degrees
+        slab_shape_ = self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast())[0].shape
+        self.image_shape_ = (self.nimg, self.nrep, self.nset, self.nphase, self.nslice, self.ncontrast,
+                             slab_shape_[1], slab_shape_[2], slab_shape_[4], slab_shape_[3])
+
         # logging.info("Container size {}".format(str(self.stack.shape)))
         logging.info("Container size {}".format(str(self.image_shape())))
 
         # Window/Level support
-        self.min = self.current_frame().min()
-        self.max = self.current_frame().max()
+        self.min, v1, v2, self.max = self.frame_stats()
         self.range = self.max - self.min
 
-        v1 = np.percentile(self.current_frame(),2)
-        v2 = np.percentile(self.current_frame(),98)
         self.window = (v2-v1)/self.range
         self.level = (v2+v1)/2/self.range
+        self.update_window_level()
 
         self.mloc = None
+        self.image = None
+        self.rgba_ = None
+        self.gray_ = None
 
         # For animation
         self.timer = None
 
-        self.selected['Channel'].setMaximum(self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast()).shape[1]-1)
+        self.selected['Channel'].setMaximum(self.image_shape()[6]-1)
         # self.selected['Slice'].setMaximum(self.fetch_image(self.repetition(), self.set(), self.phase()).shape[2]-1)
 
+        # Size of each of DIMS, looked up by button id on every wheel/animation step
+        self.dim_sizes_ = tuple(self.selected[dim].maximum() + 1 for dim in DIMS)
+
         # Disable widgets for singleton dimensions
         for dim_i, dim in enumerate(DIMS):
             if self.selected[dim].maximum() == 0:
@@ -226,52 +296,52 @@ class ImageViewer(QTW.QWidget):
 
     def frame(self):
         "Convenience method"
-        return self.selected['Instance'].value()
+        return self.instance_sb_.value()
 
     def coil(self):
         "Convenience method"
-        return self.selected['Channel'].value()
+        return self.channel_sb_.value()
 
     def slice(self):
         "Convenience method"
-        return self.selected['Slice'].value()
+        return self.slice_sb_.value()
     
     def phase(self):
         "Convenience method"
-        return self.selected['Phase'].value()
+        return self.phase_sb_.value()
     
     def set(self):
         "Convenience method"
-        return self.selected['Set'].value()
+        return self.set_sb_.value()
     
     def contrast(self):
         "Convenience method"
-        return self.selected['Contrast'].value()
+        return self.contrast_sb_.value()
     
     def repetition(self):
-        return self.selected['Repetition'].value()
+        return self.repetition_sb_.value()
 
     def image_shape(self):
-        return (self.nimg, self.nrep, self.nset, self.nphase, self.nslice, self.ncontrast,
-                self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast()).shape[1],
-                self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast()).shape[2],
-                self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast()).shape[3], 
-                self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast()).shape[4])
+        "Sizes of all dimensions, as computed in __init__"
+        return self.image_shape_
     
     def check_dim(self, v):
         "Disables animation checkbox for singleton dimensions"
         checkedId = self.dim_button_grp.checkedId()
-        # self.animate.setEnabled(self.stack.shape[checkedId] > 1)
-        self.animate.setEnabled(bool(self.image_shape()[checkedId] > 1))
+        self.animate.setEnabled(self.dim_sizes_[checkedId] > 1)
 
     def update_wl(self):
         """
         When only window / level have changed, we don't need to call imshow
-        again, just update clim.
+        again, just remap the current frame.
         """
+        self.update_window_level()
         rng = self.window_level()
-        self.image.set_clim(*rng)        
-        self.canvas.draw()
+        self.image.set_data(self.display_frame(self.current_frame(), rng))
+        if self.background_ is not None:
+            self.blit_image()
+        else:
+            self.canvas.draw_idle()
 
     def window_input(self, value, **kwargs):
         "Handles changes in window spinbox; scales to our [0..1] range"
@@ -340,8 +410,7 @@ class ImageViewer(QTW.QWidget):
         self.mloc = None
 
     def mouseDoubleClickEvent(self, event):
-        v1 = np.percentile(self.current_frame(),2)
-        v2 = np.percentile(self.current_frame(),98)
+        _, v1, v2, _ = self.frame_stats()
         self.window = (v2-v1)/self.range
         self.level = (v2+v1)/2/self.range
         self.update_wl()
@@ -353,9 +422,12 @@ class ImageViewer(QTW.QWidget):
             cont.blockSignals(False)
 
     def wheelEvent(self, event):
-        "Handle scroll event; could use some time-based limiting."
-        dimName = self.dim_button_grp.checkedButton().text()
-        control = self.selected[dimName]
+        """
+        Handle scroll event. Only steps the spinbox; the redraw is coalesced by
+        schedule_update, so a burst of wheel events renders only the last frame.
+        """
+        dim_i = self.dim_button_grp.checkedId()
+        control = self.selected[DIMS[dim_i]]
 
         num_pixels = event.pixelDelta()
         num_degrees = event.angleDelta() / 8
@@ -371,8 +443,7 @@ class ImageViewer(QTW.QWidget):
             new_v = control.value() + 1
         else:
             return
-        control.setValue(max(min(new_v,self.image_shape()[self.dim_button_grp.checkedId()]-1),0))
-        # control.setValue(max(min(new_v,self.stack.shape[self.dim_button_grp.checkedId()]-1),0))
+        control.setValue(max(min(new_v,self.dim_sizes_[dim_i]-1),0))
 
     def contextMenuEvent(self, event):
     
@@ -393,9 +464,9 @@ class ImageViewer(QTW.QWidget):
                     extent = self.ax.get_window_extent().transformed(self.fig.dpi_scale_trans.inverted())
                     self.fig.savefig(savefilepath[0], bbox_inches=extent)
                 elif sel_filter == "MAT file (*.mat)":
-                    spio.savemat(savefilepath[0], {'data': self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast())[self.frame()][self.coil()][0]})
+                    spio.savemat(savefilepath[0], {'data': self.view_frame(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast(), self.frame(), self.coil(), False, False, False, 0)})
                 elif sel_filter == "NPY file (*.npy)":
-                    np.save(savefilepath[0], self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast())[self.frame()][self.coil()][0])
+                    np.save(savefilepath[0], self.view_frame(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast(), self.frame(), self.coil(), False, False, False, 0))
                     
         elif action == saveMovieAction:
             self.save_movie()
@@ -413,7 +484,10 @@ class ImageViewer(QTW.QWidget):
             plt.draw()
             plt.show(block=False)
         elif action == showMetaAction:
-            idx_ = np.nonzero((self.container.images.headers['phase'] == self.phase()) & (self.container.images.headers['set'] == self.set()) & (self.container.images.headers['repetition'] == self.repetition()))[0][0]
+            rows_ = self.image_rows(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast())
+            if self.frame() >= rows_.size:
+                return
+            idx_ = rows_[self.frame()]
             meta = ismrmrd.Meta.deserialize(self.container.images.attributes[idx_])
             def fill_item(item, value):
                 item.setExpanded(True)
@@ -454,36 +528,89 @@ class ImageViewer(QTW.QWidget):
             fill_widget(widget, dict(meta))
             popup.exec()
 
+    def frame_stats(self):
+        "(min, 2nd percentile, 98th percentile, max) of the current frame"
+        return self.image_stats(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast(), self.frame(), self.coil())
+
+    def __image_stats(self, repetition, set, phase, slice, contrast, frame, coil):
+        """
+        (min, 2nd percentile, 98th percentile, max) of a frame; one partition of the
+        frame gives all four. They do not depend on the view orientation.
+        """
+        return tuple(np.percentile(self.image_frame(repetition, set, phase, slice, contrast, frame, coil), (0, 2, 98, 100)))
+
     def window_level(self):
+        "The (min,max) display range, as last computed by update_window_level"
+        return self.wl_
+
+    def update_window_level(self):
         "Perform calculations of (min,max) display range from window/level"
-        return (self.level * self.range 
-                  - self.window / 2 * self.range + self.min, 
-                self.level * self.range
-                  + self.window / 2 * self.range + self.min)
-    @cache
-    def fetch_image(self, repetition, set, phase, slice, contrast):
-        "Fetches the image data for the given indicies"
-
-        idx_ = ((self.container.images.headers['phase'] == phase) & 
-                (self.container.images.headers['set'] == set) & 
-                (self.container.images.headers['repetition'] == repetition) &
-                (self.container.images.headers['slice'] == slice) &
-                (self.container.images.headers['contrast'] == contrast))
-        return self.data_[idx_,:,:,:,:]
-        # return None
+        self.wl_ = (self.level * self.range
+                      - self.window / 2 * self.range + self.min,
+                    self.level * self.range
+                      + self.window / 2 * self.range + self.min)
 
-    def current_frame(self):
-        fim_ = self.fetch_image(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast())
-        if 0 in fim_.shape:
-            return np.zeros(fim_.shape[-2:])
+    def image_rows(self, repetition, set, phase, slice, contrast):
+        "Container rows of the images with the given indicies, in instance order"
+        key_ = np.ravel_multi_index((repetition, set, phase, slice, contrast), self.key_dims_)
+        return self.rows_by_key_[self.key_offsets_[key_]:self.key_offsets_[key_+1]]
+
+    def __fetch_image(self, repetition, set, phase, slice, contrast):
+        """
+        Fetches the image data for the given indicies, as a tuple of contiguous arrays.
+        Single precision complex records are reinterpreted in place as complex64; other complex
+        records are split into their (real, imag) parts, as float32 whatever their stored precision,
+        as only the 8-bit display and the window/level statistics are computed from them.
+        """
+        rows_ = self.image_rows(repetition, set, phase, slice, contrast)
+        if rows_.size > 0 and rows_[-1] - rows_[0] + 1 == rows_.size:
+            # Consecutive rows (the usual layout): a single hyperslab read, which HDF5 does
+            # much faster than a point selection of the same rows.
+            data_ = self.container.images.data[rows_[0]:rows_[-1] + 1]
         else:
-            im_ = fim_[self.frame()][self.coil()][0]
-        if self.fliph_:
-            im_ = np.flip(im_, axis=1)
-        if self.flipv_:
-            im_ = np.flip(im_, axis=0)
-        im_ = np.rot90(im_, k=self.nrot_, axes=(0,1))
-        return im_
+            data_ = self.container.images.data[rows_]
+        if data_.dtype.names is not None and 'imag' in data_.dtype.names:
+            if data_.dtype == COMPLEX64_RECORD and data_.flags.c_contiguous:
+                return (data_.view(np.complex64),)
+            return (np.ascontiguousarray(data_['real'], dtype=np.float32),
+                    np.ascontiguousarray(data_['imag'], dtype=np.float32))
+        return (data_,)
+
+    def image_frame(self, repetition, set, phase, slice, contrast, frame, coil, orientation=(False, False, False)):
+        """
+        A single (frame, coil) image for the given indicies, C-contiguous, in the given (transpose,
+        flip rows, flip columns) orientation of the stored frame. The magnitude of complex data is
+        taken for this frame only, and written straight out in that orientation.
+        """
+        parts_ = self.fetch_image(repetition, set, phase, slice, contrast)
+        if 0 in parts_[0].shape:
+            parts_ = tuple(np.zeros((1, 1) + part.shape[2:], dtype=part.dtype) for part in parts_)
+            frame, coil = 0, 0
+        transpose, flip_rows, flip_cols = orientation
+        def orient(part):
+            im_ = part[frame, coil, 0]
+            if transpose:
+                im_ = im_.T
+            return im_[::-1 if flip_rows else 1, ::-1 if flip_cols else 1]
+        parts_ = tuple(orient(part) for part in parts_)
+        # Ufuncs lay out new outputs like their (strided) inputs; give them a C-ordered one instead
+        if len(parts_) == 2:
+            return np.hypot(*parts_, out=np.empty(parts_[0].shape, dtype=np.float32))
+        if np.iscomplexobj(parts_[0]):
+            return np.abs(parts_[0], out=np.empty(parts_[0].shape, dtype=parts_[0].real.dtype))
+        return np.ascontiguousarray(parts_[0])
+
+    def current_frame(self):
+        return self.view_frame(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast(), self.frame(), self.coil(),
+                               self.transposed_, self.fliph_, self.flipv_, self.nrot_)
+
+    def __view_frame(self, repetition, set, phase, slice, contrast, frame, coil, transposed, fliph, flipv, nrot):
+        """
+        A frame with the given view transforms applied. Cached, so window/level changes and
+        scrolling back and forth over a few frames do not recompute it.
+        """
+        return self.image_frame(repetition, set, phase, slice, contrast, frame, coil,
+                                ORIENTATIONS[(transposed, fliph, flipv, nrot)])
     
     def save_movie(self):
         mid_ = self.container.images.headers[0]['measurement_uid']
@@ -496,7 +623,7 @@ class ImageViewer(QTW.QWidget):
         logging.info(f"Saving the movie from dimension {dim_name} with frame rate {framerate} fps as the filename {movie_filename}")
 
         fig = plt.figure(frameon=False)
-        w,h = self.current_frame().shape[0:2]
+        h,w = self.current_frame().shape[0:2]
         dpi = 96
         w /= dpi
         h /= dpi
@@ -505,53 +632,125 @@ class ImageViewer(QTW.QWidget):
         ax = plt.Axes(fig, [0., 0., 1., 1.])
         ax.set_axis_off()
         fig.add_axes(ax)
-        im_ax = []
-        dim_idxs = [self.repetition(), self.set(), self.phase(), self.slice(), self.contrast()]
-        Nframes = self.selected[dim_name].maximum()
-        for ii in range(Nframes):
-            dim_idxs[self.dim_button_grp.checkedId()-1] = ii
-            im_ = self.fetch_image(*dim_idxs)[self.frame()][self.coil()][0]
-            if self.fliph_:
-                im_ = np.flip(im_, axis=1)
-            if self.flipv_:
-                im_ = np.flip(im_, axis=0)
-            im_ = np.rot90(im_, k=self.nrot_, axes=(0,1))
-            ima_ = ax.imshow(im_, cmap='gray', animated=True, vmin=self.window_level()[0], vmax=self.window_level()[1], aspect='equal')
-            im_ax.append([ima_])
-
-        ani = animation.ArtistAnimation(fig, im_ax, interval=1e3/framerate, blit=True)
+        # Indicies in DIMS order; the selected dimension runs over all its values
+        dim_i = self.dim_button_grp.checkedId()
+        dim_idxs = [self.frame(), self.repetition(), self.set(), self.phase(), self.slice(), self.contrast(), self.coil()]
+        Nframes = self.dim_sizes_[dim_i]
+        wl = self.window_level()
+        # One image, updated and written out frame by frame, rather than an artist per frame
+        ima_ = ax.imshow(self.current_frame(), cmap=plt.get_cmap('gray'), vmin=wl[0], vmax=wl[1], aspect='equal')
         MWriter = animation.FFMpegWriter(fps=framerate)
-        ani.save(movie_filename, writer=MWriter)
+        with MWriter.saving(fig, movie_filename, dpi):
+            for ii in range(Nframes):
+                dim_idxs[dim_i] = ii
+                ima_.set_data(self.view_frame(*dim_idxs[1:6], dim_idxs[0], dim_idxs[6],
+                                              self.transposed_, self.fliph_, self.flipv_, self.nrot_))
+                MWriter.grab_frame()
+        plt.close(fig)
         logging.info(f"Movie saved as {movie_filename}")
     
+    def schedule_update(self, value=None):
+        """
+        Coalesces bursts of spinbox changes (wheel scrolling, animation) into
+        a single update_image call once control returns to the event loop.
+        """
+        if not self.update_pending_:
+            self.update_pending_ = True
+            QtCore.QTimer.singleShot(0, self, self.flush_update)
+
+    def flush_update(self):
+        self.update_pending_ = False
+        self.update_image()
+
     def update_image(self, slice_n=None):
         """
         Updates the displayed image when a set of indicies (frame/coil/slice)
         is selected. Connected to singals from the related spinboxes.
         """
         wl = self.window_level()
-        self.ax.clear()
-        self.image = \
-            self.ax.imshow(self.current_frame(), 
-                            vmin=wl[0],
-                            vmax=wl[1],
-                            cmap=plt.get_cmap('gray'))
-            # self.ax.imshow(self.stack[self.frame()][self.repetition()][self.set()][self.phase()][self.coil()][self.slice()], 
-            #                vmin=wl[0],
-            #                vmax=wl[1],
-            #                cmap=plt.get_cmap('gray'))
-
-        self.ax.set_xticks([])
-        self.ax.set_yticks([])
-        self.canvas.draw()
-        # TODO: Now, this does not make any sense. We could either save the mapping from multidimensional array to linear array we originally started, or look for the idx satifying
-        # the header idxs from the headers.
-        idx = self.container.images.headers[self.frame()*self.repetition()*self.set()*self.phase()+ self.repetition()*self.set()*self.phase() + self.set()*self.phase()+self.phase()] 
-        self.label.setText(self.label_base.format(int(idx['average']),int(idx['slice']),int(idx['contrast']),self.phase(),int(idx['repetition']), self.set()))
+        rgba_ = self.display_frame(self.current_frame(), wl)
+        if self.image is None:
+            self.image = self.ax.imshow(rgba_)
+
+            self.ax.set_xticks([])
+            self.ax.set_yticks([])
+            self.canvas.draw_idle()
+        elif self.image.get_array().shape != rgba_.shape:
+            # Rotated by 90 degrees: the same image, with the extent (and axes limits) of the new shape
+            self.image.set_data(rgba_)
+            rows, cols = rgba_.shape[:2]
+            self.image.set_extent((-0.5, cols - 0.5, rows - 0.5, -0.5))
+            self.background_ = None # Stale until the next full draw
+            self.canvas.draw_idle()
+        else:
+            self.image.set_data(rgba_)
+            if self.timer is not None and self.background_ is not None:
+                # Animating: only the image changes, so skip the full figure redraw.
+                self.blit_image()
+            else:
+                self.canvas.draw_idle()
+        rows_ = self.image_rows(self.repetition(), self.set(), self.phase(), self.slice(), self.contrast())
+        if self.frame() < rows_.size:
+            # The row is looked up by slice, contrast, repetition, phase and set, so only the average is not already known
+            average = int(self.header_idx_['average'][rows_[self.frame()]])
+            self.label.setText(self.label_base.format(average,self.slice(),self.contrast(),self.phase(),self.repetition(), self.set()))
+        else:
+            self.label.setText("")
+
+    def display_frame(self, frame, wl):
+        """
+        Maps frame to gray RGBA bytes for the display range wl, the same way
+        the 'gray' colormap does. Matplotlib draws RGBA bytes as they are, so
+        it does not normalize and colormap the frame on every draw.
+        """
+        # set_data copies its input, so the buffers can be reused for every frame
+        if self.rgba_ is None or self.rgba_.shape[:2] != frame.shape:
+            self.rgba_ = np.full(frame.shape + (4,), 255, dtype=np.uint8)
+            self.gray_ = np.empty(frame.shape, dtype=np.float32)
+        # 8 bits of output need no more than float32, whatever the source type; the
+        # float64 window bounds would otherwise promote the whole frame to float64.
+        span_ = wl[1] - wl[0]
+        scale_ = np.float32(256 / span_ if span_ > 0 else 0)
+        np.subtract(frame, np.float32(wl[0]), out=self.gray_, dtype=np.float32)
+        np.multiply(self.gray_, scale_, out=self.gray_)
+        np.clip(self.gray_, 0, 255, out=self.gray_)
+        self.rgba_[:, :, :3] = self.gray_[:, :, None]
+        return self.rgba_
+
+    def cache_background(self, event):
+        """
+        Stores the axes region after a full draw of the canvas, for blit_image; the animated spines,
+        and image while animating, are left out of full draws, so they are drawn here.
+        """
+        if event.canvas.is_saving():
+            return # savefig draws animated artists with the others, in its own layout
+        self.background_ = self.canvas.copy_from_bbox(self.blit_bbox())
+        if self.image is not None and self.image.get_animated():
+            self.image.draw(event.renderer)
+        self.draw_spines(event.renderer)
+
+    def draw_image(self, renderer):
+        "Draws the image, and the axes frame on top of it"
+        self.image.draw(renderer)
+        self.draw_spines(renderer)
+
+    def blit_bbox(self):
+        "The axes region, and the outer half of the spines, which straddle its edges"
+        return self.ax.bbox.padded(max(spine.get_linewidth() for spine in self.ax.spines.values()) * self.fig.dpi / 72 + 1)
+
+    def draw_spines(self, renderer):
+        for spine in self.ax.spines.values():
+            spine.draw(renderer)
+
+    def blit_image(self):
+        "Redraws only the image over the cached background"
+        self.canvas.restore_region(self.background_)
+        self.draw_image(self.canvas.get_renderer())
+        self.canvas.blit(self.blit_bbox())
 
     def transpose_image(self):
-        # TODO
-        # self.stack = self.stack.swapaxes(-2,-1)
+        # Only the displayed 2D frame is transposed, in current_frame
+        self.transposed_ = not self.transposed_
         self.update_image()
 
     def set_timer_interval(self, fps):
@@ -566,19 +765,22 @@ class ImageViewer(QTW.QWidget):
             if self.timer:
                 self.timer.stop()
                 self.timer = None
+                self.image.set_animated(False)
+                self.canvas.draw_idle()
             
             pixmapi = QTW.QStyle.StandardPixmap.SP_MediaPlay
             icon = self.style().standardIcon(pixmapi)
             self.animate.setIcon(icon)
             return
         
-        dimName = self.dim_button_grp.checkedButton().text()
+        dim_i = self.dim_button_grp.checkedId()
+        dimName = DIMS[dim_i]
 
         pixmapi = QTW.QStyle.StandardPixmap.SP_MediaPause
         icon = self.style().standardIcon(pixmapi)
         self.animate.setIcon(icon)
 
-        if self.selected[dimName].maximum() == 0:
+        if self.dim_sizes_[dim_i] == 1:
             logging.warn("Cannot animate singleton dimension.")
             self.animate.setChecked(False)
             return
@@ -586,8 +788,12 @@ class ImageViewer(QTW.QWidget):
         def increment():
             "Captures dimName"
             v = self.selected[dimName].value()
-            m = self.selected[dimName].maximum()
-            self.selected[dimName].setValue((v+1) % m)
+            self.selected[dimName].setValue((v+1) % self.dim_sizes_[dim_i])
+
+        # Leave the image out of full draws while animating, so the cached background is just the axes
+        self.image.set_animated(True)
+        self.background_ = None
+        self.canvas.draw_idle()
 
         self.timer = QtCore.QTimer(self)
         self.timer.setInterval(self.timer_interval)
@@ -1,4 +1,6 @@
 
+import functools
+import itertools
 import logging
 
 from PySide6 import QtWidgets, QtCore
@@ -28,6 +30,60 @@ waveform_header_fields = [
     ('waveform_id', 'Waveform ID', "Waveform ID.")
 ]
 
+@functools.lru_cache(maxsize=16)
+def sample_index(num_samples):
+    """
+    Sample numbers 0..num_samples-1, shared between waveforms of the same length; scale by the
+    sample time for a time axis. Unlike np.arange with a float step, always num_samples long.
+    """
+    index = np.arange(num_samples, dtype=np.float64)
+    index.flags.writeable = False
+    return index
+
+
+def decimate(x_scale, wave_data, max_points=4000, x_range=None):
+    """
+    Min/max decimation for display. When a waveform has many more samples than the canvas has
+    pixels, each run of samples is replaced by its minimum and maximum, which keeps the envelope
+    of the trace with a fraction of the vertices. wave_data is (channels, samples). With an
+    x_range, only the samples within it are kept, and one either side, so the trace reaches
+    the edges of the axes; a zoomed in view then shows the actual samples.
+    """
+    if x_range is not None:
+        start = max(np.searchsorted(x_scale, x_range[0], side='right') - 1, 0)
+        stop = np.searchsorted(x_scale, x_range[1], side='left') + 1
+        x_scale, wave_data = x_scale[start:stop], wave_data[:, start:stop]
+
+    num_samples = wave_data.shape[1]
+    if num_samples <= max_points:
+        return x_scale, wave_data
+    # Rounded up, so there are at most max_points // 2 (min, max) pairs
+    stride = -(-num_samples // (max_points // 2))
+
+    num_bins = num_samples // stride
+    end = num_bins * stride
+    bins = wave_data[:, :end].reshape(wave_data.shape[0], num_bins, stride)
+    decimated = np.empty((wave_data.shape[0], 2 * num_bins + num_samples - end), dtype=wave_data.dtype)
+    decimated[:, 0:2 * num_bins:2] = bins.min(axis=2)
+    decimated[:, 1:2 * num_bins:2] = bins.max(axis=2)
+    decimated[:, 2 * num_bins:] = wave_data[:, end:]
+
+    # Each (min, max) pair spans its run of samples
+    x_decimated = np.empty(decimated.shape[1], dtype=x_scale.dtype)
+    x_decimated[0:2 * num_bins:2] = x_scale[0:end:stride]
+    x_decimated[1:2 * num_bins:2] = x_scale[stride - 1:end:stride]
+    x_decimated[2 * num_bins:] = x_scale[end:]
+    return x_decimated, decimated
+
+
+def decimate_traces(traces, x_range=None):
+    "(x, y) of every channel of every (x_scale, wave_data) trace, decimated over x_range"
+    for x_scale, wave_data in traces:
+        x_scale, wave_data = decimate(x_scale, wave_data, x_range=x_range)
+        for wave in wave_data:
+            yield x_scale, wave
+
+
 class WaveformModel(QtCore.QAbstractTableModel):
 
     def __init__(self, container):
@@ -35,6 +91,9 @@ class WaveformModel(QtCore.QAbstractTableModel):
 
         self.container = container
         self.waveforms = CachedDataset(container.waveforms)
+        self.last_row = (None, None)
+        # Read from the headers alone, without loading any waveform data
+        self.waveform_ids = np.ascontiguousarray(container.waveforms.data.fields('head')[()]['waveform_id'])
 
         logging.info("Waveform constructor.")
 
@@ -60,16 +119,35 @@ class WaveformModel(QtCore.QAbstractTableModel):
         return None
 
     def data(self, index, role=Qt.DisplayRole):
-        waveform = self.waveforms[index.row()]
         attribute, _, tooltip = waveform_header_fields[index.column()]
 
+        # Qt asks for many roles per cell; only the displayed value needs the waveform
         if role == Qt.DisplayRole:
-            return getattr(waveform,attribute)
+            return getattr(self.waveform(index.row()),attribute)
         if role == Qt.ToolTipRole:
             return tooltip
 
         return None
 
+    def waveform(self, row):
+        "The waveform at row; Qt reads a row's cells one after another, so the last row is kept at hand"
+        if self.last_row[0] != row:
+            self.last_row = (row, self.waveforms[row])
+        return self.last_row[1]
+
+
+def select_channel(wave, channel):
+    return wave[channel:channel + 1]
+
+def select_all_channels(wave):
+    return wave
+
+def label_scan(scan, coil):
+    return str(scan)
+
+def label_scan_channel(scan, coil):
+    return str((scan, coil))
+
 
 class WaveformControlGUI(QtWidgets.QWidget):
 
@@ -83,15 +161,14 @@ class WaveformControlGUI(QtWidgets.QWidget):
         self.setLayout(layout)
 
     def __set_num_channels(self, num_channels):
-        for i in range(self.channel_selector.count()):
-            self.channel_selector.removeItem(i)
+        self.channel_selector.clear()
 
         for idx in range(num_channels):
-            self.channel_selector.addItem("Channel " + str(idx), userData={"selector": lambda x, i=idx : x[:, i:i + 1],
-                                                                           "labeler": lambda scan, coil: str(scan)})
+            self.channel_selector.addItem("Channel " + str(idx), userData={"selector": functools.partial(select_channel, channel=idx),
+                                                                           "labeler": label_scan})
 
-        self.channel_selector.addItem("All Channels", userData={"selector": lambda x: x,
-                                                                "labeler": lambda scan, coil: str((scan, coil))})
+        self.channel_selector.addItem("All Channels", userData={"selector": select_all_channels,
+                                                                "labeler": label_scan_channel})
 
     def label(self, scan, coil):
         return self.channel_selector.currentData()["labeler"](scan, coil)
@@ -110,55 +187,185 @@ class WaveformPlotter(FigureCanvas):
         self.axis = np.atleast_1d(self.figure.subplots(1, 1, sharex='col'))
         self.figure.subplots_adjust(hspace=0)
 
-        self.legend = mpl.legend.Legend(self.figure, [], [])
-        self.figure.legends.append(self.legend)
+        self.legend = self.figure.legend([], [])
+        self.legend.set_animated(True)
+        self.legend_labels = []
+        self.lines = None
+        # Full resolution (x_scale, wave_data) of what is shown, re-decimated for the visible x range
+        # on every zoom or pan; with the Line2D per channel of plot_concat, or else self.lines.
+        self.traces = []
+        self.trace_lines = None
+        self.decimated_range = None
+        self.axis[0].callbacks.connect('xlim_changed', self.xlim_changed)
         super().__init__(self.figure)
 
+        # Figure without the (animated) lines and legend, for blit_lines; refreshed after every full draw
+        self.background = None
+        self.background_limits = None
+        self.mpl_connect('draw_event', self.cache_background)
+
     def clear(self):
         for ax in self.axis:
             ax.clear()
+        self.lines = None
+        self.background = None
+        self.traces = []
+        self.trace_lines = None
+        self.decimated_range = None
+        # Clearing the axes drops their callbacks
+        self.axis[0].callbacks.connect('xlim_changed', self.xlim_changed)
 
     def plot(self, waveforms,  formatter, labeler):
-
+        """
+        Shows every channel of the given waveforms. Successive calls update the data of
+        the same artists, rather than clearing the axes and creating new ones.
+        """
+        traces, labels = [], []
         for waveform in waveforms:
             x_step = waveform.sample_time_us
-            x_scale = np.arange(0, waveform.data.shape[1] * x_step, x_step)
-            wave_data = formatter(waveform.data.T)
-            for chan, wave in enumerate(wave_data.T):
-                self.axis[0].plot(x_scale, wave, label=labeler(waveform.scan_counter,chan))
-
-        handles, labels = self.axis[0].get_legend_handles_labels()
-        self.legend = mpl.legend.Legend(self.figure, handles, labels)
-        self.figure.legends[0] = self.legend
-
-        self.figure.canvas.draw()
+            x_scale = sample_index(waveform.data.shape[1]) * x_step
+            wave_data = formatter(waveform.data)
+            traces.append((x_scale, wave_data))
+            labels.extend(labeler(waveform.scan_counter,chan) for chan in range(wave_data.shape[0]))
+
+        if not traces or self.lines is None:
+            # Nothing to show, or the first plot after clear() / plot_concat: start from empty axes
+            self.clear()
+        self.traces = traces
+        self.decimated_range = None
+        segments = [np.column_stack(xy) for xy in decimate_traces(traces)]
+
+        # A single collection for every channel of every waveform, rather than a Line2D each;
+        # colored as successive plot() calls would be, with a legend entry per channel.
+        colors = [style['color'] for style, _ in zip(itertools.cycle(mpl.rcParams['axes.prop_cycle']), segments)]
+        if segments:
+            ax = self.axis[0]
+            if self.lines is None:
+                self.lines = mpl.collections.LineCollection([], animated=True)
+                ax.add_collection(self.lines, autolim=False)
+            self.lines.set_segments(segments)
+            self.lines.set_colors(colors)
+
+            # Limits for the new data only, as clearing the axes would give
+            ax.ignore_existing_data_limits = True
+            ax.update_datalim(self.lines.get_datalim(ax.transData).get_points())
+            ax.set_autoscale_on(True)
+            ax.autoscale_view()
+
+        if labels != self.legend_labels:
+            self.set_legend([mpl.lines.Line2D([], [], color=color) for color in colors], labels)
+        elif (segments and self.background is not None
+              and self.background_limits == (self.axis[0].get_xlim(), self.axis[0].get_ylim())):
+            # Same limits (so same ticks) and legend: only the lines changed
+            self.blit_lines()
+            return
+
+        self.figure.canvas.draw_idle()
 
     def plot_concat(self, waveforms,  formatter, labeler):
 
-        self.axis[0].clear()
-        wave_data = np.concatenate([formatter(waveform.data.T) for waveform in waveforms])
+        self.clear()
+        # Copy each waveform's (channels, samples) rows straight into their place in the output; as
+        # float32, which is plenty for display, whatever the stored type, converting during the copy.
+        num_channels = formatter(waveforms[0].data).shape[0]
+        wave_data = np.empty((num_channels, sum(waveform.data.shape[1] for waveform in waveforms)),
+                             dtype=np.float32)
+        offset = 0
+        for waveform in waveforms:
+            num_samples = waveform.data.shape[1]
+            wave_data[:, offset:offset + num_samples] = formatter(waveform.data)
+            offset += num_samples
         x_step = waveforms[0].sample_time_us
-        x_scale = np.arange(0, wave_data.shape[0] * x_step, x_step)*1e-6
-        self.axis[0].plot(x_scale, wave_data)
+        x_scale = sample_index(wave_data.shape[1]) * (x_step * 1e-6)
+        self.traces = [(x_scale, wave_data)]
+        x_scale, wave_data = decimate(x_scale, wave_data)
+        self.trace_lines = self.axis[0].plot(x_scale, wave_data.T) # One line per column
         self.axis[0].set_xlabel("Time [s]")
 
-        handles, labels = self.axis[0].get_legend_handles_labels()
-        self.legend = mpl.legend.Legend(self.figure, handles, labels)
-        self.figure.legends[0] = self.legend
-
-        self.figure.canvas.draw()
+        self.set_legend(*self.axis[0].get_legend_handles_labels())
+
+        self.figure.canvas.draw_idle()
+
+    def xlim_changed(self, ax):
+        "Decimates the traces again for the new x range, down to the actual samples when zoomed in"
+        x_range = tuple(sorted(ax.get_xlim()))
+        if all(x_range[0] <= x_scale[0] and x_scale[-1] <= x_range[1] for x_scale, _ in self.traces if len(x_scale)):
+            x_range = None # All of every trace is visible: its full decimation
+        if x_range == self.decimated_range:
+            return
+        self.decimated_range = x_range
+
+        if self.trace_lines is not None:
+            for line, xy in zip(self.trace_lines, decimate_traces(self.traces, x_range)):
+                line.set_data(*xy)
+        elif self.lines is not None:
+            self.lines.set_segments([np.column_stack(xy) for xy in decimate_traces(self.traces, x_range)])
+
+    def cache_background(self, event):
+        """
+        Stores the figure after a full draw. The lines and the legend over them are
+        animated, so left out of full draws; they are drawn here.
+        """
+        if event.canvas.is_saving():
+            return # savefig draws animated artists with the others, in its own layout
+        self.background = self.copy_from_bbox(self.figure.bbox)
+        self.background_limits = (self.axis[0].get_xlim(), self.axis[0].get_ylim())
+        self.draw_lines(event.renderer)
+
+    def draw_lines(self, renderer):
+        "Draws the lines, and the legend which goes over them"
+        if self.lines is not None:
+            self.lines.draw(renderer)
+        self.legend.draw(renderer)
+
+    def blit_lines(self):
+        "Redraws only the lines and legend over the cached background"
+        self.restore_region(self.background)
+        self.draw_lines(self.get_renderer())
+        self.blit(self.figure.bbox)
+
+    def set_legend(self, handles, labels):
+        "Replaces the figure legend, unless it already shows these labels"
+        if labels == self.legend_labels:
+            return
+        self.legend.remove()
+        self.legend = self.figure.legend(handles, labels)
+        self.legend.set_animated(True)
+        self.legend_labels = labels
 
     def set_titles(self, titles):
         for ax, title in zip(self.axis, titles):
             ax.set_title(title, loc="right", pad=-10)
 
 
+class WaveformFetchTask(QtCore.QRunnable):
+    """
+    Reads waveforms that are not yet buffered on a pool thread, so the GUI stays
+    responsive while they are decoded; fetched is emitted on the GUI thread.
+    """
+
+    class Signals(QtCore.QObject):
+        fetched = QtCore.Signal(int, object)
+
+    def __init__(self, waveforms, indices, generation):
+        super().__init__()
+        self.waveforms = waveforms
+        self.indices = indices
+        self.generation = generation
+        self.signals = WaveformFetchTask.Signals()
+
+    def run(self):
+        self.signals.fetched.emit(self.generation, self.waveforms.read_many(self.indices))
+
+
 class WaveformViewer(QtWidgets.QSplitter):
 
     def __init__(self, container):
         super().__init__()
 
         self.model = WaveformModel(container)
+        self.fetch_generation = 0
+        self.pending_plot = None
 
         self.waveforms = AcquisitionTable(self)
         self.waveforms.setModel(self.model)
@@ -194,19 +401,66 @@ class WaveformViewer(QtWidgets.QSplitter):
         self.plot([waveform])
 
     def format_data(self, acq):
-        return self.waveform_gui.transform_waveform(acq.data.T)
+        return self.waveform_gui.transform_waveform(acq.data)
 
-    def selection_changed(self):
-        self.canvas.clear()
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.pending_plot is not None:
+            pending_plot, self.pending_plot = self.pending_plot, None
+            pending_plot()
 
-        indices = set([idx.row() for idx in self.waveforms.selectedIndexes()])
-        waveforms = [self.model.waveforms[idx] for idx in
-                        indices]
+    def defer_if_hidden(self, plot):
+        "While the canvas is hidden, remembers the latest plot request for showEvent instead"
+        if self.canvas.isVisible():
+            return False
+        self.pending_plot = plot
+        return True
+
+    def selection_changed(self):
+        if self.defer_if_hidden(self.selection_changed):
+            return
+        indices = sorted(set([idx.row() for idx in self.waveforms.selectedIndexes()]))
+        missing = [idx for idx in indices if idx not in self.model.waveforms]
+        self.fetch_generation += 1
+        if not missing:
+            self.plot_selection(indices)
+        else:
+            self.start_fetch(missing, self.fetch_generation)
+        self.prefetch_neighbours(indices)
+
+    def start_fetch(self, indices, generation):
+        task = WaveformFetchTask(self.model.waveforms, indices, generation)
+        task.signals.fetched.connect(self.waveforms_fetched)
+        QtCore.QThreadPool.globalInstance().start(task)
+
+    def prefetch_neighbours(self, indices):
+        "Buffers the rows just before and after the selection, the likely next ones to be selected"
+        if not indices:
+            return
+        neighbours = [idx for idx in (indices[0] - 1, indices[-1] + 1)
+                      if 0 <= idx < self.model.rowCount() and idx not in self.model.waveforms]
+        if neighbours:
+            self.start_fetch(neighbours, -1)
+
+    def waveforms_fetched(self, generation, items):
+        # Only plot the latest selection, from the fetched items themselves, which get_many then
+        # buffers; an older fetch or a prefetch just fills the buffer
+        if generation == self.fetch_generation:
+            self.plot_selection(sorted(set([idx.row() for idx in self.waveforms.selectedIndexes()])), items)
+        else:
+            self.model.waveforms.store(items)
+
+    def plot_selection(self, indices, items=()):
+        waveforms = self.model.waveforms.get_many(indices, items)
         self.canvas.plot(waveforms, self.waveform_gui.transform_waveform, self.waveform_gui.label)
 
     def plot_whole_waveform(self):
+        if self.defer_if_hidden(self.plot_whole_waveform):
+            return
         indices = list([idx.row() for idx in self.waveforms.selectedIndexes()])
-        sel_id = self.model.waveforms[indices[-1]].waveform_id
-        waveforms = [wf for wf in self.model.waveforms if wf.waveform_id == sel_id]
+        if not indices:
+            return
+        sel_id = self.model.waveform_ids[indices[-1]]
+        waveforms = self.model.waveforms.get_many(np.flatnonzero(self.model.waveform_ids == sel_id).tolist())
         self.canvas.plot_concat(waveforms, self.waveform_gui.transform_waveform, self.waveform_gui.label)
 
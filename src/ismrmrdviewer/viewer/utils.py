@@ -18,6 +18,45 @@ class CachedDataset :
         self.__buffer_value(key,acq)
         return acq
 
+    def __contains__(self, key):
+        "Whether the item at key is buffered"
+        return key in self.buffer
+
+    def get_many(self, keys, items=()):
+        """
+        Items at the given keys, in order. The (key, item) pairs in items, as read by read_many
+        on a worker thread, are used as they are; of the other keys, those not yet buffered are
+        read with read_many. The result is built from these and the buffer hits, and only as
+        many of the items read as fit are buffered afterwards, so none is evicted and read again.
+        """
+        items = list(items)
+        found = dict(items)
+        found.update((key, self[key]) for key in keys if key not in found and key in self)
+        read = self.read_many(key for key in keys if key not in found)
+        found.update(read)
+        self.store((items + read)[-self.buffer_size:])
+        return [found[key] for key in keys]
+
+    def read_many(self, keys):
+        """
+        Reads the given keys from the dataset in a single selection: a slice when they are
+        consecutive, else a point selection of just those rows; returns (key, item) pairs.
+        Does not touch the buffer, so it can run on a worker thread, with store called back
+        on the owning thread.
+        """
+        keys = sorted(set(keys))
+        if not keys:
+            return []
+        if keys[-1] - keys[0] + 1 == len(keys):
+            return list(zip(keys, self.dataset[keys[0]:keys[-1] + 1]))
+        # Interleaved rows, as of one waveform id: far faster than a slice per row
+        return [(key, self.dataset.from_numpy(raw)) for key, raw in zip(keys, self.dataset.data[keys])]
+
+    def store(self, items):
+        "Buffers (key, item) pairs, as from read_many"
+        for key, acq in items:
+            self.__buffer_value(key, acq)
+
     def __buffer_value(self,key,acq ):
         self.buffer[key] = acq
         if len(self.buffer) > self.buffer_size: